@@ -0,0 +1,182 @@
+"""
+Measurements of rendered volumes, computed one layer at a time from boolean
+occupancy masks, without building sets of points.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from volume import Box
+
+
+Stats = namedtuple('Stats', 'total, layer_counts, extents, surface')
+
+Connectivity = namedtuple('Connectivity', 'labels, sizes, floating, unsupported')
+
+
+def neighbors_empty(mask, below, above):
+    """
+    Mark the cells of a layer which have at least one empty neighbor among
+    the six face neighbors. Cells beyond the edge of the layer count as
+    empty, as do cells in a missing layer above or below.
+    """
+    padded = np.pad(mask, 1)
+    empty = ~(
+        padded[:-2, 1:-1] & padded[2:, 1:-1] &
+        padded[1:-1, :-2] & padded[1:-1, 2:]
+    )
+    for layer in (below, above):
+        if layer is None:
+            empty[:] = True
+        else:
+            empty |= ~layer
+    return empty
+
+
+def volume_stats(volume):
+    """
+    Count the points of a volume, in total and for each nonempty z layer,
+    along with the box that tightly surrounds them and the number of surface
+    points.
+
+    A surface point is one with an empty face neighbor, which is what shows
+    on the outside of a build. Only three layers are held in memory at once.
+
+    >>> from volume import Sphere
+    >>> stats = volume_stats(Sphere((0, 0, 0), 1.5))
+    >>> stats.total, stats.surface
+    (19, 18)
+    >>> stats.layer_counts
+    {-1: 5, 0: 9, 1: 5}
+    """
+    box = volume.bounds()
+    layer_counts = {}
+    surface = 0
+    x_used = np.zeros(box.shape()[0], dtype=bool)
+    y_used = np.zeros(box.shape()[1], dtype=bool)
+
+    # Keep a window of the previous, current and next layers.
+    layers = volume.layer_masks()
+    below = None
+    current = next(layers, None)
+    while current is not None:
+        z, mask = current
+        following = next(layers, None)
+        above = None if following is None else following[1]
+
+        count = int(np.count_nonzero(mask))
+        if count:
+            layer_counts[z] = count
+            surface += int(np.count_nonzero(
+                mask & neighbors_empty(mask, below, above)
+            ))
+            x_used |= mask.any(axis=1)
+            y_used |= mask.any(axis=0)
+
+        below = mask
+        current = following
+
+    occupied = list(layer_counts)
+    if occupied:
+        xs = np.flatnonzero(x_used) + box.xlo
+        ys = np.flatnonzero(y_used) + box.ylo
+        extents = Box([
+            (int(xs[0]), int(xs[-1])),
+            (int(ys[0]), int(ys[-1])),
+            (occupied[0], occupied[-1]),
+        ])
+    else:
+        extents = None
+
+    return Stats(
+        total=sum(layer_counts.values()),
+        layer_counts=layer_counts,
+        extents=extents,
+        surface=surface,
+    )
+
+
+## Connectivity ##
+
+def as_occupancy(volume):
+    if isinstance(volume, np.ndarray):
+        return volume
+    return volume.occupancy()
+
+
+def connected_components(volume):
+    """
+    Find the face-connected pieces of a volume, or of a boolean occupancy
+    grid indexed by [x, y, z].
+
+    Returns a Connectivity tuple of:
+    - labels: an integer grid numbering each piece from 1, with 0 for empty
+    - sizes: the number of points in each piece, indexed by label
+    - floating: the labels of pieces which do not reach the lowest occupied
+      layer, and so are not supported by the ground
+    - unsupported: a boolean grid of the points above the lowest occupied
+      layer with nothing directly below them
+
+    The labeling is a single linear time pass, which handles grids of
+    hundreds of millions of points.
+
+    >>> from volume import Sphere, Union
+    >>> balls = Union(Sphere((0, 0, 0), 2), Sphere((0, 0, 5), 1.5))
+    >>> result = connected_components(balls)
+    >>> result.sizes.tolist(), result.floating
+    ([0, 27, 19], [2])
+    >>> int(result.unsupported.sum())
+    9
+    """
+    from scipy.ndimage import label
+
+    occupancy = as_occupancy(volume)
+    labels, count = label(occupancy)
+    sizes = np.bincount(labels.ravel(), minlength=count + 1)
+    sizes[0] = 0
+
+    layers = np.flatnonzero(occupancy.any(axis=(0, 1)))
+    if len(layers) == 0:
+        return Connectivity(labels, sizes, [], np.zeros_like(occupancy))
+    ground = layers[0]
+
+    grounded = np.zeros(count + 1, dtype=bool)
+    grounded[labels[:, :, ground]] = True
+    floating = np.flatnonzero(~grounded[1:]) + 1
+
+    unsupported = np.zeros_like(occupancy)
+    unsupported[:, :, ground + 1:] = (
+        occupancy[:, :, ground + 1:] & ~occupancy[:, :, ground:-1]
+    )
+    return Connectivity(labels, sizes, floating.tolist(), unsupported)
+
+
+def layer_components(volume):
+    """
+    Find the pieces of each z layer separately, connected within the layer
+    by shared edges.
+
+    Returns a labels grid, numbering pieces across all of the layers from 1,
+    and a list with the sizes of the pieces in each layer.
+    """
+    from scipy.ndimage import label
+
+    occupancy = as_occupancy(volume)
+    # Connect only the neighbors within the same layer.
+    structure = np.zeros((3, 3, 3), dtype=bool)
+    structure[:, :, 1] = [
+        [0, 1, 0],
+        [1, 1, 1],
+        [0, 1, 0],
+    ]
+    labels, count = label(occupancy, structure)
+    sizes = np.bincount(labels.ravel(), minlength=count + 1)
+
+    # Labels are assigned in scan order, which for [x, y, z] indexing
+    # interleaves the layers, so group them by layer afterwards.
+    layer_sizes = [[] for z in range(occupancy.shape[2])]
+    for z in range(occupancy.shape[2]):
+        for piece in np.unique(labels[:, :, z]):
+            if piece:
+                layer_sizes[z].append(int(sizes[piece]))
+    return labels, layer_sizes
@@ -0,0 +1,102 @@
+"""
+Merge shapes made of different materials into grids of material labels.
+
+Each shape contributes a material id with a priority, and where shapes
+overlap, the highest priority material wins. Label grids are indexed by
+[x, y] for layers, or [x, y, z] for volumes, with 0 meaning empty. They are
+turned into text through a table of glyphs for each material.
+
+>>> labels = composite([
+...     ({(0, 0), (1, 0), (2, 0)}, 1, 0),
+...     ({(1, 0), (1, 1)}, 2, 1),
+... ], (3, 2))
+>>> print(format_labels(labels, {0: '.', 1: '_', 2: '#'}))
+.#.
+_#_
+"""
+import numpy as np
+
+from volume import Box
+
+
+def points_mask(points, shape):
+    """
+    Convert a collection of 2D points into a boolean mask of the given shape.
+    Points outside of the mask are dropped, as in format_points().
+    """
+    mask = np.zeros(shape, dtype=bool)
+    if not points:
+        return mask
+    x, y = np.array(list(points), dtype=int).T
+    inside = (x >= 0) & (x < shape[0]) & (y >= 0) & (y < shape[1])
+    mask[x[inside], y[inside]] = True
+    return mask
+
+
+def composite(shapes, shape):
+    """
+    Merge shapes into a label grid of the given shape.
+
+    The shapes are (cells, material, priority) triples, where cells is either
+    a boolean mask or a collection of 2D points. Materials are nonzero ids.
+    Where shapes overlap, the higher priority wins, and ties go to the later
+    shape.
+    """
+    labels = np.zeros(shape, dtype=int)
+    best = np.full(shape, -np.inf)
+    for cells, material, priority in shapes:
+        if isinstance(cells, np.ndarray):
+            mask = cells
+        else:
+            mask = points_mask(cells, shape)
+        wins = mask & (priority >= best)
+        labels[wins] = material
+        best[wins] = priority
+    return labels
+
+
+def composite_volumes(volumes):
+    """
+    Merge (volume, material, priority) triples into a 3D label grid over the
+    box surrounding all of the volumes.
+
+    Returns the box and the label grid, indexed by
+    [x - xlo, y - ylo, z - zlo].
+    """
+    box = Box.from_volumes([v for v, material, priority in volumes])
+    shapes = []
+    for volume, material, priority in volumes:
+        inner = volume.bounds()
+        mask = np.zeros(box.shape(), dtype=bool)
+        mask[
+            inner.xlo - box.xlo:inner.xhi - box.xlo + 1,
+            inner.ylo - box.ylo:inner.yhi - box.ylo + 1,
+            inner.zlo - box.zlo:inner.zhi - box.zlo + 1,
+        ] = volume.occupancy()
+        shapes.append((mask, material, priority))
+    return box, composite(shapes, box.shape())
+
+
+def format_labels(labels, glyphs, raw=False):
+    """
+    Draw a 2D label grid as text, with the same layout as format_points().
+
+    The glyphs map each material id, including 0 for empty cells, to the
+    string drawn for it.
+    """
+    table = np.array([glyphs[i] for i in range(max(glyphs) + 1)])
+    # Put y = 0 on the bottom row.
+    lines = table[labels].T[::-1].tolist()
+    if raw:
+        return lines
+    return '\n'.join(''.join(line).rstrip() for line in lines)
+
+
+def draw_label_layers(labels, glyphs):
+    """
+    Draw each z layer of a 3D label grid, like draw_layers() does for points.
+    """
+    return [
+        format_labels(labels[:, :, z], glyphs)
+        for z in range(labels.shape[2])
+    ]
@@ -0,0 +1,293 @@
+"""
+Compile a volume expression tree into a single fused evaluator.
+
+Evaluating a composite volume node by node allocates a full size temporary
+mask at every level of the tree. A compiled volume instead runs the whole
+tree over one block of points at a time, with each node writing into scratch
+buffers that are the size of a block, and are reused for every block.
+
+>>> from volume import Sphere, Difference
+>>> deathstar = Difference(Sphere((0, 0, 0), 10), Sphere((5, 5, 5), 10))
+>>> compiled = compile_volume(deathstar)
+>>> len(list(compiled.render()))
+2543
+"""
+import numpy as np
+
+from volume import (
+    Box,
+    Difference,
+    Intersection,
+    Plane,
+    Point3,
+    Sphere,
+    Transform,
+    Translate,
+    Union,
+    Volume,
+)
+
+
+class Scratch:
+    """
+    Block sized buffers, handed out by tree depth. Nodes at the same depth
+    are never evaluated at the same time, so they can share buffers.
+    """
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self.buffers = {}
+
+    def get(self, depth, name, shape=(), dtype=float):
+        key = (depth, name)
+        if key not in self.buffers:
+            self.buffers[key] = np.empty(
+                (self.block_size,) + shape,
+                dtype=dtype,
+            )
+        return self.buffers[key]
+
+
+## Node compilers ##
+
+# Each compiler takes a volume, the scratch buffers and the depth of the node,
+# and returns a kernel function kernel(x, y, z, out). The coordinate arrays
+# and the output mask all have the length of the current block.
+
+def compile_sphere(volume, scratch, depth):
+    cx, cy, cz = volume.center
+    radius = volume.radius
+    d_buf = scratch.get(depth, 'd')
+    t_buf = scratch.get(depth, 't')
+
+    def kernel(x, y, z, out):
+        n = len(x)
+        d = d_buf[:n]
+        t = t_buf[:n]
+        np.subtract(x, cx, out=d)
+        np.multiply(d, d, out=d)
+        np.subtract(y, cy, out=t)
+        np.multiply(t, t, out=t)
+        np.add(d, t, out=d)
+        np.subtract(z, cz, out=t)
+        np.multiply(t, t, out=t)
+        np.add(d, t, out=d)
+        np.sqrt(d, out=d)
+        np.less(d, radius, out=out)
+    return kernel
+
+
+def compile_plane(volume, scratch, depth):
+    cx, cy, cz = volume.center
+    nx, ny, nz = volume.normal
+    d_buf = scratch.get(depth, 'd')
+    t_buf = scratch.get(depth, 't')
+
+    def kernel(x, y, z, out):
+        n = len(x)
+        d = d_buf[:n]
+        t = t_buf[:n]
+        np.subtract(x, cx, out=d)
+        np.multiply(d, nx, out=d)
+        np.subtract(y, cy, out=t)
+        np.multiply(t, ny, out=t)
+        np.add(d, t, out=d)
+        np.subtract(z, cz, out=t)
+        np.multiply(t, nz, out=t)
+        np.add(d, t, out=d)
+        np.greater_equal(d, 0, out=out)
+    return kernel
+
+
+def compile_box(volume, scratch, depth):
+    limits = [
+        (volume.xlo, volume.xhi),
+        (volume.ylo, volume.yhi),
+        (volume.zlo, volume.zhi),
+    ]
+    m_buf = scratch.get(depth, 'm', dtype=bool)
+
+    def kernel(x, y, z, out):
+        m = m_buf[:len(x)]
+        out[:] = True
+        for c, (lo, hi) in zip((x, y, z), limits):
+            np.greater_equal(c, lo, out=m)
+            np.logical_and(out, m, out=out)
+            np.less_equal(c, hi, out=m)
+            np.logical_and(out, m, out=out)
+    return kernel
+
+
+def compile_translate(volume, scratch, depth):
+    ox, oy, oz = volume.offset
+    p_buf = scratch.get(depth, 'p', shape=(3,))
+    inner = compile_node(volume.volume, scratch, depth + 1)
+
+    def kernel(x, y, z, out):
+        p = p_buf[:len(x)]
+        np.subtract(x, ox, out=p[:, 0])
+        np.subtract(y, oy, out=p[:, 1])
+        np.subtract(z, oz, out=p[:, 2])
+        inner(p[:, 0], p[:, 1], p[:, 2], out)
+    return kernel
+
+
+def compile_transform(volume, scratch, depth):
+    offset = volume.offset
+    inverse_t = volume.inverse.T
+    p_buf = scratch.get(depth, 'p', shape=(3,))
+    q_buf = scratch.get(depth, 'q', shape=(3,))
+    inner = compile_node(volume.volume, scratch, depth + 1)
+
+    def kernel(x, y, z, out):
+        n = len(x)
+        p = p_buf[:n]
+        q = q_buf[:n]
+        p[:, 0] = x
+        p[:, 1] = y
+        p[:, 2] = z
+        np.subtract(p, offset, out=p)
+        np.matmul(p, inverse_t, out=q)
+        inner(q[:, 0], q[:, 1], q[:, 2], out)
+    return kernel
+
+
+def compile_combination(combine):
+    """
+    Make a compiler for a node that evaluates its first child into the output
+    mask, and folds each following child into it with combine(out, mask).
+    """
+    def compile_csg(children, scratch, depth):
+        first, *rest = [
+            compile_node(child, scratch, depth + 1)
+            for child in children
+        ]
+        m_buf = scratch.get(depth, 'm', dtype=bool)
+
+        def kernel(x, y, z, out):
+            m = m_buf[:len(x)]
+            first(x, y, z, out)
+            for child in rest:
+                child(x, y, z, m)
+                combine(out, m)
+        return kernel
+    return compile_csg
+
+
+def _or(out, m):
+    np.logical_or(out, m, out=out)
+
+
+def _and(out, m):
+    np.logical_and(out, m, out=out)
+
+
+def _and_not(out, m):
+    np.logical_not(m, out=m)
+    np.logical_and(out, m, out=out)
+
+
+compile_union = compile_combination(_or)
+compile_intersection = compile_combination(_and)
+compile_difference = compile_combination(_and_not)
+
+
+def compile_fallback(volume, scratch, depth):
+    """
+    Evaluate volumes with no compiler through their own contains_array().
+    """
+    def kernel(x, y, z, out):
+        out[:] = volume.contains_array(np.column_stack([x, y, z]))
+    return kernel
+
+
+def compile_node(volume, scratch, depth):
+    # Check the most specific types first, since Translate is a Transform.
+    if isinstance(volume, Sphere):
+        return compile_sphere(volume, scratch, depth)
+    if isinstance(volume, Plane):
+        return compile_plane(volume, scratch, depth)
+    if isinstance(volume, Box):
+        return compile_box(volume, scratch, depth)
+    if isinstance(volume, Translate):
+        return compile_translate(volume, scratch, depth)
+    if isinstance(volume, Transform):
+        return compile_transform(volume, scratch, depth)
+    if isinstance(volume, Union):
+        return compile_union(volume.volumes, scratch, depth)
+    if isinstance(volume, Intersection):
+        return compile_intersection(volume.volumes, scratch, depth)
+    if isinstance(volume, Difference):
+        return compile_difference(
+            (volume.volume,) + tuple(volume.others),
+            scratch,
+            depth,
+        )
+    return compile_fallback(volume, scratch, depth)
+
+
+## Compiled volumes ##
+
+class CompiledVolume(Volume):
+    """
+    A volume evaluated by a fused kernel, one block of points at a time.
+    """
+    def __init__(self, volume, block_size=16384):
+        self.volume = volume
+        self.block_size = block_size
+        scratch = Scratch(block_size)
+        self.kernel = compile_node(volume, scratch, 0)
+        self.points = scratch.get(-1, 'points', shape=(3,))
+
+    def contains(self, point):
+        return self.volume.contains(point)
+
+    def contains_array(self, points):
+        result = np.empty(len(points), dtype=bool)
+        for start in range(0, len(points), self.block_size):
+            block = points[start:start + self.block_size]
+            p = self.points[:len(block)]
+            p[:] = block
+            self.kernel(
+                p[:, 0], p[:, 1], p[:, 2],
+                result[start:start + len(block)],
+            )
+        return result
+
+    def bounds(self):
+        return self.volume.bounds()
+
+    def render_blocks(self):
+        """
+        Yield the points inside the volume as (N, 3) integer arrays, walking
+        the bounding box one block at a time.
+        """
+        box = self.bounds()
+        shape = box.shape()
+        lo = np.array([box.xlo, box.ylo, box.zlo])
+        total = int(np.prod(shape))
+        mask = np.empty(self.block_size, dtype=bool)
+        for start in range(0, total, self.block_size):
+            index = np.arange(start, min(start + self.block_size, total))
+            points = np.column_stack(np.unravel_index(index, shape)) + lo
+            p = self.points[:len(points)]
+            p[:] = points
+            m = mask[:len(points)]
+            self.kernel(p[:, 0], p[:, 1], p[:, 2], m)
+            yield points[m]
+
+    def render_array(self):
+        return np.concatenate(
+            [np.empty((0, 3), dtype=int)] + list(self.render_blocks())
+        )
+
+    def render(self):
+        for points in self.render_blocks():
+            for x, y, z in points.tolist():
+                yield Point3(x, y, z)
+
+
+def compile_volume(volume, block_size=16384):
+    """
+    Compile a volume expression tree into a CompiledVolume.
+    """
+    return CompiledVolume(volume, block_size)
@@ -0,0 +1,194 @@
+"""
+One dimensional bounded minimizers, used by Path to search along its curve.
+
+Each optimizer minimizes a function of t over the interval [lo, hi]. When
+`vectorized` is true, the function accepts an array of t values and returns
+an array of results, which lets sampling optimizers evaluate in one call.
+
+Optimizers can also solve many problems over the same interval at once,
+given a function func(ts, index) which evaluates problem number index[i] at
+ts[i] for arrays of any shape.
+"""
+import math
+
+import numpy as np
+
+
+class Optimizer:
+    # Whether minimize_many() solves all of the problems together, rather than
+    # one at a time.
+    batched = False
+
+    def minimize(self, func, lo, hi, vectorized=False):
+        """
+        Return the t value in [lo, hi] at which func is minimized.
+        """
+        raise NotImplementedError()
+
+    def minimize_many(self, func, lo, hi, count):
+        """
+        Return an array of the t values which minimize each of the problems.
+
+        This default solves the problems one at a time.
+        """
+        def problem_func(i):
+            def f(ts):
+                return func(ts, np.full(np.shape(ts), i))
+            return f
+
+        return np.array([
+            self.minimize(problem_func(i), lo, hi, vectorized=True)
+            for i in range(count)
+        ], dtype=float)
+
+
+class BrentOptimizer(Optimizer):
+    """
+    SciPy's bounded Brent method. SciPy is only imported on first use, since
+    importing it takes longer than rendering most small shapes.
+    """
+    def minimize(self, func, lo, hi, vectorized=False):
+        from scipy.optimize import minimize_scalar
+        if vectorized:
+            array_func = func
+
+            def func(t):
+                return array_func(np.array([t]))[0]
+        res = minimize_scalar(
+            func,
+            bounds=(lo, hi),
+            method='bounded',
+        )
+        return res.x
+
+
+class GoldenSectionOptimizer(Optimizer):
+    """
+    Golden-section search in pure Python. Like Brent's method, it finds a
+    local minimum of the function.
+
+    >>> t = GoldenSectionOptimizer().minimize(lambda t: (t - 2)**2, 0, 5)
+    >>> round(t, 4)
+    2.0
+    """
+    inverse_phi = (math.sqrt(5) - 1) / 2
+    batched = True
+
+    def __init__(self, tolerance=1e-5):
+        self.tolerance = tolerance
+
+    def minimize(self, func, lo, hi, vectorized=False):
+        if vectorized:
+            array_func = func
+
+            def func(t):
+                return array_func(np.array([t]))[0]
+
+        a, b = lo, hi
+        c = b - self.inverse_phi * (b - a)
+        d = a + self.inverse_phi * (b - a)
+        fc = func(c)
+        fd = func(d)
+        while (b - a) > self.tolerance:
+            if fc < fd:
+                b, d, fd = d, c, fc
+                c = b - self.inverse_phi * (b - a)
+                fc = func(c)
+            else:
+                a, c, fc = c, d, fd
+                d = a + self.inverse_phi * (b - a)
+                fd = func(d)
+        return (a + b) / 2
+
+    def minimize_many(self, func, lo, hi, count):
+        # Run the same search for every problem in lockstep. The brackets all
+        # shrink at the same rate, so each step needs a single call to func.
+        index = np.arange(count)
+        a = np.full(count, lo, dtype=float)
+        b = np.full(count, hi, dtype=float)
+        c = b - self.inverse_phi * (b - a)
+        d = a + self.inverse_phi * (b - a)
+        fc = func(c, index)
+        fd = func(d, index)
+        while count and (b - a).max() > self.tolerance:
+            left = fc < fd
+            a = np.where(left, a, c)
+            b = np.where(left, d, b)
+            e = np.where(
+                left,
+                b - self.inverse_phi * (b - a),
+                a + self.inverse_phi * (b - a),
+            )
+            fe = func(e, index)
+            c, d = np.where(left, e, d), np.where(left, c, e)
+            fc, fd = np.where(left, fe, fd), np.where(left, fc, fe)
+        return (a + b) / 2
+
+
+class GridOptimizer(Optimizer):
+    """
+    Sample the function on an even grid, then repeatedly zoom in on the
+    neighborhood of the best sample. Unlike the bracketing methods, this finds
+    the global minimum of any function which is smooth at the grid scale.
+
+    >>> def f(t):
+    ...     return math.cos(t) - t / 10
+    >>> round(GridOptimizer().minimize(f, 0, 10), 4)
+    9.5249
+    >>> round(GoldenSectionOptimizer().minimize(f, 0, 10), 4)
+    3.2418
+    """
+    batched = True
+
+    def __init__(self, samples=64, tolerance=1e-5):
+        self.samples = samples
+        self.tolerance = tolerance
+
+    def minimize(self, func, lo, hi, vectorized=False):
+        while True:
+            ts = np.linspace(lo, hi, self.samples)
+            if vectorized:
+                values = func(ts)
+            else:
+                values = np.fromiter(
+                    (func(t) for t in ts.tolist()),
+                    dtype=float,
+                    count=len(ts),
+                )
+            i = int(np.argmin(values))
+            if (hi - lo) <= self.tolerance:
+                return float(ts[i])
+            lo = ts[max(i - 1, 0)]
+            hi = ts[min(i + 1, self.samples - 1)]
+
+    def minimize_many(self, func, lo, hi, count):
+        rows = np.arange(count)
+        index = np.repeat(rows[:, None], self.samples, axis=1)
+        steps = np.linspace(0, 1, self.samples)
+        lo = np.full(count, lo, dtype=float)
+        hi = np.full(count, hi, dtype=float)
+        while True:
+            ts = lo[:, None] + (hi - lo)[:, None] * steps
+            i = np.argmin(func(ts, index), axis=1)
+            if count == 0 or (hi - lo).max() <= self.tolerance:
+                return ts[rows, i]
+            lo = ts[rows, np.maximum(i - 1, 0)]
+            hi = ts[rows, np.minimum(i + 1, self.samples - 1)]
+
+
+optimizers = {
+    'brent': BrentOptimizer,
+    'golden': GoldenSectionOptimizer,
+    'grid': GridOptimizer,
+}
+
+
+def get_optimizer(optimizer):
+    """
+    Look up an optimizer by name, or pass an Optimizer instance through.
+    """
+    if isinstance(optimizer, str):
+        if optimizer not in optimizers:
+            raise ValueError('Unknown optimizer: {!r}'.format(optimizer))
+        return optimizers[optimizer]()
+    return optimizer
@@ -0,0 +1,413 @@
+"""
+Declarative scene files, and a command line tool to render them in batches.
+
+A scene is a JSON object with a "volume" tree and a list of "outputs":
+
+    {
+        "volume": {
+            "type": "difference",
+            "volumes": [
+                {"type": "sphere", "center": [0, 0, 0], "radius": 10},
+                {"type": "sphere", "center": [5, 5, 5], "radius": 10}
+            ]
+        },
+        "outputs": [
+            {"type": "layers", "path": "deathstar.txt"},
+            {"type": "count", "path": "deathstar_count.txt"}
+        ]
+    }
+
+Render any number of scene files with:
+
+    python scene.py scenes/*.json --jobs 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from volume import (
+    Box,
+    Difference,
+    Instances,
+    Intersection,
+    Path,
+    Plane,
+    Point3,
+    Rotate,
+    Scale,
+    Sphere,
+    Translate,
+    Union,
+    draw_layers,
+    lerp,
+    vectorized,
+)
+
+
+## Parametric curves ##
+
+# The curve functions all take arrays of t values.
+
+def line_curve(start, end):
+    @vectorized
+    def position(t):
+        return tuple(lerp(a, b, t) for a, b in zip(start, end))
+    return position, (0, 1)
+
+
+def circle_curve(center, radius):
+    cx, cy, cz = center
+
+    @vectorized
+    def position(t):
+        return (
+            cx + radius * np.sin(t),
+            cy + radius * np.cos(t),
+            cz,
+        )
+    return position, (0, 2 * np.pi)
+
+
+def helix_curve(center, radius, pitch, turns):
+    cx, cy, cz = center
+
+    @vectorized
+    def position(t):
+        return (
+            cx + radius * np.sin(t),
+            cy + radius * np.cos(t),
+            cz + pitch * t / (2 * np.pi),
+        )
+    return position, (0, 2 * np.pi * turns)
+
+
+# Each curve takes its JSON parameters as keyword arguments, and returns the
+# position function along with its default (tmin, tmax) domain.
+curves = {
+    'line': line_curve,
+    'circle': circle_curve,
+    'helix': helix_curve,
+}
+
+
+def radius_function(radius, tmin, tmax):
+    """
+    A path radius is either a constant, or a [start, end] pair which is
+    interpolated linearly over the path.
+    """
+    if isinstance(radius, (int, float)):
+        return vectorized(lambda t: radius)
+    start, end = radius
+    return vectorized(lambda t: lerp(start, end, (t - tmin) / (tmax - tmin)))
+
+
+## Building volumes ##
+
+def build_path(spec):
+    position_func, (tmin, tmax) = curves[spec['curve']](**spec['params'])
+    tmin = spec.get('tmin', tmin)
+    tmax = spec.get('tmax', tmax)
+    bounds = spec.get('bounds')
+    return Path(
+        position_func,
+        radius_function(spec['radius'], tmin, tmax),
+        tmin=tmin,
+        tmax=tmax,
+        bounds=None if bounds is None else Box(bounds),
+        # Curves like helices come near a point at several t values, where
+        # the bracketing optimizers can settle on a local minimum, so default
+        # to the global grid search.
+        optimizer=spec.get('optimizer', 'grid'),
+    )
+
+
+builders = {
+    'sphere': lambda s: Sphere(s['center'], s['radius']),
+    'box': lambda s: Box(s['bounds']),
+    'plane': lambda s: Plane(s['center'], s['normal'], Box(s['bounds'])),
+    'path': build_path,
+    'union': lambda s: Union(*map(build_volume, s['volumes'])),
+    'intersection': lambda s: Intersection(*map(build_volume, s['volumes'])),
+    'difference': lambda s: Difference(*map(build_volume, s['volumes'])),
+    'translate': lambda s: Translate(build_volume(s['volume']), s['offset']),
+    'rotate': lambda s: Rotate(
+        build_volume(s['volume']),
+        s['axis'],
+        s['angle'],
+        s.get('center', (0, 0, 0)),
+    ),
+    'scale': lambda s: Scale(
+        build_volume(s['volume']),
+        s['factor'],
+        s.get('center', (0, 0, 0)),
+    ),
+    'instances': lambda s: Instances(build_volume(s['volume']), s['offsets']),
+}
+
+
+def build_volume(spec):
+    """
+    Build a volume from its JSON description.
+    """
+    kind = spec['type']
+    if kind not in builders:
+        raise ValueError('Unknown volume type: {!r}'.format(kind))
+    return builders[kind](spec)
+
+
+## Incremental scenes ##
+
+class Scene:
+    """
+    A composite volume made of named components, which keeps its rendered
+    occupancy so that editing one component only re-renders the region that
+    component covered before or covers now.
+
+    The combine function takes a dictionary of the component volumes by
+    name, and builds the composite volume from them with unions,
+    intersections and differences, for example:
+
+        Scene(
+            {'body': Sphere((0, 0, 0), 10), 'cut': Sphere((5, 5, 5), 10)},
+            lambda c: Difference(c['body'], c['cut']),
+        )
+    """
+    def __init__(self, components, combine):
+        self.combine = combine
+        self.components = {}
+        self.cached = {}
+        for name, volume in components.items():
+            self._set_component(name, volume)
+        self.volume = self._build()
+        self.box = self.volume.bounds()
+        self.grid = self.volume.occupancy(self.box)
+
+    def _set_component(self, name, volume):
+        self.components[name] = volume
+        # A single instance keeps the rasterized occupancy of its volume, so
+        # the composite reads unchanged components from memory.
+        self.cached[name] = Instances(volume, [(0, 0, 0)])
+
+    def _build(self):
+        return self.combine(self.cached)
+
+    def update(self, name, volume):
+        """
+        Replace one component, and re-render the scene where it changed.
+        """
+        old_bounds = self.cached[name].bounds()
+        self._set_component(name, volume)
+        dirty = old_bounds.union(self.cached[name].bounds())
+
+        # Outside of the dirty region the composite is unchanged, and in
+        # particular it stays empty outside of the old bounds.
+        self.volume = self._build()
+        box = self.volume.bounds()
+        if box != self.box:
+            grid = np.zeros(box.shape(), dtype=bool)
+            overlap = box.intersection(self.box)
+            if all(overlap.shape()):
+                grid[grid_slices(overlap, box)] = (
+                    self.grid[grid_slices(overlap, self.box)]
+                )
+            self.box = box
+            self.grid = grid
+
+        region = dirty.intersection(self.box)
+        if all(region.shape()):
+            self.grid[grid_slices(region, self.box)] = (
+                self.volume.occupancy(region)
+            )
+        return region
+
+    def render(self):
+        lo = np.array([self.box.xlo, self.box.ylo, self.box.zlo])
+        for x, y, z in (np.argwhere(self.grid) + lo).tolist():
+            yield Point3(x, y, z)
+
+
+def grid_slices(region, box):
+    """
+    Index the part of a grid over box which covers the region inside it.
+    """
+    return tuple(
+        slice(lo - box_lo, hi - box_lo + 1)
+        for (lo, hi), (box_lo, box_hi) in zip(region._bounds, box._bounds)
+    )
+
+
+## Outputs ##
+
+def write_layers(points, target, path):
+    sep = '-' * 80
+    lines = [sep]
+    if len(points) > 0:
+        layers = draw_layers(
+            (Point3(*p) for p in points.tolist()),
+            on=target.get('on', '[]'),
+            off=target.get('off', '  '),
+        )
+        for layer in layers:
+            lines.append(layer)
+            lines.append(sep)
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def write_points(points, target, path):
+    with open(path, 'w') as f:
+        json.dump(points.tolist(), f)
+
+
+def write_count(points, target, path):
+    with open(path, 'w') as f:
+        f.write('{}\n'.format(len(points)))
+
+
+writers = {
+    'layers': write_layers,
+    'points': write_points,
+    'count': write_count,
+}
+
+
+## Rendering ##
+
+# The modules whose code decides what a volume description renders to,
+# including the defaults for anything the description leaves out.
+render_modules = ['optimizers', 'shape_template', 'volume', __name__]
+
+
+def code_version():
+    """
+    Hash the source of the rendering code, so that cached renders from an
+    older version of the code are not reused.
+    """
+    digest = hashlib.sha256()
+    for name in render_modules:
+        with open(sys.modules[name].__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def scene_key(spec):
+    """
+    Hash the volume description along with the rendering code, so that
+    scenes with the same geometry share one cached render.
+    """
+    text = json.dumps(spec, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256(code_version().encode('utf-8'))
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_cached(spec, cache_dir=None):
+    """
+    Render a volume description to an (N, 3) array of points, reusing the
+    result from the cache directory if another scene already rendered it.
+
+    Returns the points, and whether they came from the cache.
+    """
+    if cache_dir is None:
+        return build_volume(spec).render_array(), False
+
+    path = os.path.join(cache_dir, scene_key(spec) + '.npy')
+    if os.path.exists(path):
+        return np.load(path), True
+
+    points = build_volume(spec).render_array()
+    # Write to a unique temporary name first, so that a worker never reads a
+    # partially written file.
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        np.save(f, points)
+    os.replace(temp_path, path)
+    return points, False
+
+
+def render_scene_file(path, cache_dir=None):
+    """
+    Render one scene file and write its outputs, with paths relative to the
+    scene file.
+
+    Returns the number of points, and whether the render was cached.
+    """
+    with open(path) as f:
+        scene = json.load(f)
+    points, cached = render_cached(scene['volume'], cache_dir)
+
+    base_dir = os.path.dirname(path)
+    for target in scene.get('outputs', []):
+        kind = target['type']
+        if kind not in writers:
+            raise ValueError('Unknown output type: {!r}'.format(kind))
+        writers[kind](points, target, os.path.join(base_dir, target['path']))
+    return len(points), cached
+
+
+def timed_render(path, cache_dir):
+    start = time.perf_counter()
+    count, cached = render_scene_file(path, cache_dir)
+    return count, cached, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Render scene files in parallel.',
+    )
+    parser.add_argument('scenes', nargs='+', help='scene JSON files')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes (default: one per CPU)',
+    )
+    parser.add_argument(
+        '--cache', default='.scene_cache',
+        help='directory of cached renders (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='render every scene from scratch',
+    )
+    args = parser.parse_args(argv)
+
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache
+        os.makedirs(cache_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {
+            pool.submit(timed_render, path, cache_dir): path
+            for path in args.scenes
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                count, cached, seconds = future.result()
+            except Exception as e:
+                failures += 1
+                print('{}  FAILED: {}'.format(path, e))
+                continue
+            print('{}  {:.3f}s  {} points{}'.format(
+                path,
+                seconds,
+                count,
+                '  (cached)' if cached else '',
+            ))
+    print('{} scenes in {:.3f}s'.format(
+        len(args.scenes),
+        time.perf_counter() - start,
+    ))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,14 +21,56 @@ def circle(center, radius):
     min_y = int(math.ceil(cy - radius))
     max_y = int(math.floor(cy + radius))
 
+    # The circle is its own mirror image across its center lines. If these
+    # fall on or halfway between grid lines, the mirror image of a grid point
+    # is another grid point, so only test one quadrant.
+    mirror_x = on_half_grid(cx)
+    mirror_y = on_half_grid(cy)
+    if mirror_x:
+        min_x = max(min_x, int(math.ceil(cx)))
+    if mirror_y:
+        min_y = max(min_y, int(math.ceil(cy)))
+
     points = []
     for x in range(min_x, max_x + 1):
         for y in range(min_y, max_y + 1):
             dist2 = (x - cx)**2 + (y - cy)**2
             if dist2 <= radius2:
                 points.append((x, y))
+
+    if mirror_x:
+        points.extend(mirror_points(points, 0, cx))
+    if mirror_y:
+        points.extend(mirror_points(points, 1, cy))
     return set(points)
 
+def on_half_grid(c):
+    """
+    Determine whether reflecting across the coordinate c maps grid points onto
+    grid points.
+
+    >>> on_half_grid(3), on_half_grid(2.5), on_half_grid(2.25)
+    (True, True, False)
+    """
+    return float(2 * c).is_integer()
+
+def mirror_points(points, axis, c):
+    """
+    Reflect points across the line where the given axis equals c, leaving out
+    points on the line itself.
+
+    >>> mirror_points([(0, 0), (1, 2)], 0, 0.5)
+    [(1, 0), (0, 2)]
+    """
+    doubled = int(2 * c)
+    result = []
+    for p in points:
+        p = list(p)
+        if 2 * p[axis] != doubled:
+            p[axis] = doubled - p[axis]
+            result.append(tuple(p))
+    return result
+
 def ring(center, outer_radius, inner_radius):
     """
     >>> print(format_points(offset_points(ring((0, 0), 3.5, 1.0))))
@@ -237,6 +279,84 @@ def polygon(vertices):
     max_y = math.ceil(max(y for x, y in vertices))
 
     points = [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+    return clip_polygon(points, vertices)
+
+def clip_polygon(points, vertices):
+    """
+    Keep the points inside the polygon with the clockwise series of vertices.
+    """
     for a, b in zip(vertices, vertices[1:] + [vertices[0]]):
         points = list(partition(points, a, b))
     return set(points)
+
+def regular_polygon(center, radius, num_sides, start_angle):
+    """
+    A regular polygon with its vertices at the given radius from the center.
+    The first vertex is straight up from the center, rotated counter-clockwise
+    by start_angle degrees, and the rest follow clockwise.
+
+    >>> print(format_points(regular_polygon((2, 2), 2, 4, 0)))
+      #
+     ###
+    #####
+     ###
+      #
+
+    When rotating the polygon about its center by a quarter or half turn maps
+    grid points onto grid points, only that fraction of the points is tested,
+    and the rest are filled in by rotation.
+    """
+    vertices = []
+    for i in range(num_sides):
+        angle = start_angle - (i * 360) / num_sides
+        point = vec.rotate((0, radius), math.radians(angle))
+        vertices.append(vec.add(center, point))
+
+    cx, cy = center
+    quarter_turns = (
+        float(cx + cy).is_integer() and
+        float(cx - cy).is_integer()
+    )
+    if num_sides % 4 == 0 and quarter_turns:
+        order = 4
+    elif num_sides % 2 == 0 and on_half_grid(cx) and on_half_grid(cy):
+        order = 2
+    else:
+        order = 1
+
+    min_x = math.floor(min(x for x, y in vertices))
+    max_x = math.ceil(max(x for x, y in vertices))
+    min_y = math.floor(min(y for x, y in vertices))
+    max_y = math.ceil(max(y for x, y in vertices))
+
+    # Work in doubled coordinates relative to the center, which are integers
+    # for every grid point when the center is on the half grid.
+    def in_fundamental_region(x, y):
+        u = 2 * x - 2 * cx
+        v = 2 * y - 2 * cy
+        if order == 4:
+            return (u > 0 and v >= 0) or (u == 0 and v == 0)
+        if order == 2:
+            return u > 0 or (u == 0 and v >= 0)
+        return True
+
+    points = [
+        (x, y)
+        for x in range(min_x, max_x + 1)
+        for y in range(min_y, max_y + 1)
+        if in_fundamental_region(x, y)
+    ]
+    points = clip_polygon(points, vertices)
+
+    result = set(points)
+    for p in points:
+        u = round(2 * p[0] - 2 * cx)
+        v = round(2 * p[1] - 2 * cy)
+        for i in range(1, order):
+            for turn in range(4 // order):
+                u, v = -v, u
+            result.add((
+                round((u + 2 * cx) / 2),
+                round((v + 2 * cy) / 2),
+            ))
+    return result
@@ -1,5 +1,6 @@
 import math
-from shape_template import interpolate, ring, radial_slice, format_points
+from shape_template import interpolate, ring, radial_slice
+from composite import composite, format_labels
 
 ring_width = 1.3
 slice_width = 4.8
@@ -37,20 +38,17 @@ for step in range(num_steps + 1):
 
 def by_twos(iterable):
     iterable = iter(iterable)
-    while True:
-        yield next(iterable), next(iterable)
+    for a in iterable:
+        yield a, next(iterable, set())
 
-for z, (a, b) in enumerate(by_twos(layers)):
-    a_lines = format_points(a, on='_', off='.', max_x=c*2, max_y=c*2, raw=True)
-    b_lines = format_points(b, on='#', max_x=c*2, max_y=c*2, raw=True)
-    for y, line in enumerate(b_lines):
-        for x, character in enumerate(line):
-            if character == '#':
-                a_lines[y][x] = '#'
+# Each pair of layers is drawn together, with the upper layer on top, and the
+# center marked if nothing covers it.
+glyphs = {0: '.', 1: '_', 2: 'X', 3: '#'}
+size = (c*2 + 1, c*2 + 1)
 
-    if a_lines[c][c] != '#':
-        a_lines[c][c] = 'X'
+for z, (a, b) in enumerate(by_twos(layers)):
+    labels = composite([(a, 1, 0), ({center}, 2, 1), (b, 3, 2)], size)
 
     print('-'*c*2)
     print('z', z)
-    print('\n'.join(''.join(line).rstrip() for line in a_lines))
+    print(format_labels(labels, glyphs))
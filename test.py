@@ -1,16 +1,39 @@
-from nose.tools import assert_equal
+from nose.tools import assert_equal, assert_raises
 
 import math
+import subprocess
+import sys
 from textwrap import dedent
 
+import numpy as np
+
+from analysis import connected_components, layer_components, volume_stats
+from composite import composite_volumes, draw_label_layers
+from fused import compile_volume
+from scene import Scene, build_volume
+from shape_template import circle, polygon
+from voxels import VoxelSet
 from volume import (
     Box,
+    Difference,
+    Extrude,
+    Instances,
+    Intersection,
     Sphere,
+    Symmetry,
     Plane,
     Path,
     Point3,
+    Revolve,
+    Rotate,
+    Scale,
+    Translate,
+    Union,
+    Volume,
+    distances,
     draw_layers,
     lerp,
+    vectorized,
 )
 
 
@@ -191,3 +214,574 @@ def test_parametric_changing_radius():
             --------###--------
         ''').strip(),
     )
+
+
+def test_translate():
+    sphere = Sphere((0.5, 0.5, 0.5), 2)
+    moved = Translate(sphere, (3, -2, 7))
+    assert_equal(
+        set(moved.render()),
+        set(sphere.shifted((3, -2, 7)).render()),
+    )
+    assert_equal(
+        moved.bounds(),
+        Box([(1, 6), (-4, 1), (5, 10)]),
+    )
+
+
+def test_rotate():
+    # Rotate a flat slab standing along x so that it stands along y instead.
+    slab = Box([(-0.5, 3.5), (-0.5, 0.5), (-0.5, 0.5)])
+    rotated = Rotate(slab, (0, 0, 1), 90)
+    assert_equal(
+        sorted(rotated.render()),
+        [Point3(0, y, 0) for y in range(4)],
+    )
+
+
+def test_scale():
+    sphere = Sphere((0, 0, 0), 1.5)
+    flattened = Scale(sphere, (2.5, 2.5, 0.5))
+    assert_equal(
+        flattened.bounds(),
+        Box([(-5, 5), (-5, 5), (-1, 1)]),
+    )
+    layers = draw_layers(flattened.render(), on='#', off='-')
+    assert_equal(
+        '\n\n'.join(layers),
+        dedent('''
+            -#####-
+            #######
+            #######
+            #######
+            #######
+            #######
+            -#####-
+        ''').strip(),
+    )
+
+
+def test_instances():
+    sphere = Sphere((0.5, 0.5, 0.5), 2)
+    offsets = [(0, 0, 0), (3, 0, 0), (10, 10, 0), (0, 0, 2.5)]
+    pillars = Instances(sphere, offsets)
+
+    expected = set()
+    for offset in offsets:
+        expected |= set(sphere.shifted(offset).render())
+    assert_equal(set(pillars.render()), expected)
+    assert_equal(
+        pillars.bounds(),
+        Box([(-2, 13), (-2, 13), (-2, 6)]),
+    )
+    assert_equal(
+        [pillars.contains(p) for p in [(4, 1, 1), (7, 1, 1), (1, 1, 4)]],
+        [True, False, True],
+    )
+
+    # A prototype with bounds given by hand, which are not integers.
+    half_space = Plane((0, 0, 0), (1, 1, 1), Box([(-1.5, 1.5)] * 3))
+    offsets = [(0, 0, 0), (10, 0, 0), (0.5, 20, 0)]
+    expected = set()
+    for offset in offsets:
+        copy = Translate(half_space, offset)
+        expected |= set(
+            p for p in copy.bounds().to_integers().render()
+            if copy.contains(p)
+        )
+    assert_equal(set(Instances(half_space, offsets).render()), expected)
+
+
+def test_scene_difference():
+    volume = build_volume({
+        'type': 'difference',
+        'volumes': [
+            {'type': 'sphere', 'center': [0, 0, 0], 'radius': 5},
+            {'type': 'sphere', 'center': [2, 2, 2], 'radius': 5},
+        ],
+    })
+    a = Sphere((0, 0, 0), 5)
+    b = Sphere((2, 2, 2), 5)
+    assert_equal(
+        set(volume.render()),
+        set(a.render()) - set(b.render()),
+    )
+    assert_equal(
+        set(volume.render()),
+        set(Difference(a, b).render()),
+    )
+
+
+def test_empty_intersection():
+    # Spheres which don't overlap have an inverted intersection box.
+    volume = build_volume({
+        'type': 'intersection',
+        'volumes': [
+            {'type': 'sphere', 'center': [0, 0, 0], 'radius': 1},
+            {'type': 'sphere', 'center': [0, 20, 0], 'radius': 1},
+        ],
+    })
+    assert_equal(list(volume.render()), [])
+    assert_equal(volume.render_array().shape, (0, 3))
+    assert_equal(list(volume.layer_masks()), [])
+    assert_equal(volume_stats(volume).total, 0)
+    assert_equal(len(VoxelSet.from_volume(volume)), 0)
+
+
+def test_scene_path():
+    # The same torus as test_parametric_torus.
+    torus = build_volume({
+        'type': 'path',
+        'curve': 'circle',
+        'params': {'center': [0, 0, 0], 'radius': 1.9},
+        'radius': 0.9,
+    })
+    layers = draw_layers(torus.render(), on='#', off='-')
+    assert_equal(
+        '\n\n'.join(layers),
+        dedent('''
+            -###-
+            ##-##
+            #---#
+            ##-##
+            -###-
+        ''').strip(),
+    )
+
+
+def test_scene_update():
+    def combine(c):
+        return Union(Difference(c['body'], c['cut']), c['moon'], c['ring'])
+
+    def ring(radius):
+        return build_volume({
+            'type': 'path',
+            'curve': 'circle',
+            'params': {'center': [0, -15, 0], 'radius': radius},
+            'radius': 0.9,
+        })
+
+    scene = Scene(
+        {
+            'body': Sphere((0, 0, 0), 6),
+            'cut': Sphere((3, 3, 3), 5),
+            'moon': Sphere((15, 0, 0), 2),
+            'ring': ring(1.9),
+        },
+        combine,
+    )
+    # Only the old and new bounds of the edited component are re-rendered.
+    region = scene.update('moon', Sphere((15, 0, 0), 3))
+    assert_equal(region, Box([(12, 18), (-3, 3), (-3, 3)]))
+    # Grow the scene, then shrink it again.
+    scene.update('body', Sphere((0, 0, 0), 8))
+    scene.update('moon', Sphere((15, 0, 0), 1))
+    scene.update('ring', ring(3))
+    expected = combine({
+        'body': Sphere((0, 0, 0), 8),
+        'cut': Sphere((3, 3, 3), 5),
+        'moon': Sphere((15, 0, 0), 1),
+        'ring': ring(3),
+    })
+    assert_equal(scene.box, expected.bounds())
+    assert_equal(set(scene.render()), set(expected.render()))
+
+
+def test_scene_helix():
+    # The tube around a helix comes near most points at two or more places,
+    # so check the default optimizer against sampling the curve densely.
+    helix = build_volume({
+        'type': 'path',
+        'curve': 'helix',
+        'params': {'center': [0, 0, 0], 'radius': 4, 'pitch': 4, 'turns': 2},
+        'radius': [1, 2],
+    })
+    ts = np.linspace(0, 4 * np.pi, 4001)
+    positions = np.column_stack([
+        4 * np.sin(ts),
+        4 * np.cos(ts),
+        4 * ts / (2 * np.pi),
+    ])
+    radii = lerp(1, 2, ts / (4 * np.pi))
+    expected = set()
+    for slab in Box([(-8, 8), (-8, 8), (-4, 12)]).slabs():
+        d = distances(positions[None], slab[:, None, :])
+        i = d.argmin(axis=1)
+        inside = radii[i] > d[np.arange(len(slab)), i]
+        expected.update(Point3(*p) for p in slab[inside].tolist())
+    assert_equal(set(helix.render()), expected)
+
+
+def test_compiled_volume():
+    # A deeper version of test_plane_sphere_boolean, with small blocks so
+    # that the buffers are reused many times.
+    sphere = Sphere((0, 0, 0), 6)
+    plane = Plane((0, 0, 0), (0, 0, 1), sphere.bounds())
+    volume = Union(
+        Difference(sphere, plane, Sphere((2, 2, -2), 3)),
+        Intersection(
+            Translate(Sphere((0, 0, 0), 4), (0.5, 0.5, 3)),
+            Rotate(Box([(-2, 2), (-6, 6), (-6, 6)]), (0, 1, 0), 45),
+        ),
+    )
+    compiled = compile_volume(volume, block_size=100)
+    assert_equal(
+        set(compiled.render()),
+        set(volume.render()),
+    )
+    points = sphere.bounds().render_array().astype(float) / 2
+    assert_equal(
+        compiled.contains_array(points).tolist(),
+        volume.contains_array(points).tolist(),
+    )
+
+
+def test_volume_import_skips_scipy():
+    output = subprocess.check_output([
+        sys.executable,
+        '-c',
+        'import sys, volume; print("scipy" in sys.modules)',
+    ])
+    assert_equal(output.strip(), b'False')
+
+
+def test_path_optimizers():
+    def circle(t):
+        return (1.9 * math.sin(t), 1.9 * math.cos(t), 0)
+
+    for optimizer in ['brent', 'golden', 'grid']:
+        torus = Path(
+            circle,
+            lambda t: 0.9,
+            tmin=0,
+            tmax=(2 * math.pi),
+            optimizer=optimizer,
+        )
+        layers = draw_layers(torus.render(), on='#', off='-')
+        assert_equal(
+            '\n\n'.join(layers),
+            dedent('''
+                -###-
+                ##-##
+                #---#
+                ##-##
+                -###-
+            ''').strip(),
+        )
+
+
+def test_volume_stats():
+    a = Sphere((0, 0, 0), 5)
+    b = Sphere((3, 3, 3), 5)
+    points = set(a.render()) - set(b.render())
+    stats = volume_stats(Difference(a, b))
+
+    assert_equal(stats.total, len(points))
+    assert_equal(
+        stats.layer_counts,
+        {
+            z: len([p for p in points if p.z == z])
+            for z in sorted(set(p.z for p in points))
+        },
+    )
+    assert_equal(stats.extents, Box([(-4, 4), (-4, 4), (-4, 4)]))
+
+    neighbors = [
+        (1, 0, 0), (-1, 0, 0),
+        (0, 1, 0), (0, -1, 0),
+        (0, 0, 1), (0, 0, -1),
+    ]
+    surface = [
+        p for p in points
+        if any(
+            (p.x + dx, p.y + dy, p.z + dz) not in points
+            for dx, dy, dz in neighbors
+        )
+    ]
+    assert_equal(stats.surface, len(surface))
+
+
+def test_composite_volumes():
+    # A small sphere of one material, half sunk into a slab of another.
+    slab = Box([(-2, 2), (-2, 2), (-1, 0)])
+    ball = Sphere((0, 0, 0), 1.5)
+    box, labels = composite_volumes([(slab, 1, 0), (ball, 2, 1)])
+
+    assert_equal(box, Box([(-2, 2), (-2, 2), (-2, 2)]))
+    layers = draw_label_layers(labels, {0: '-', 1: '=', 2: '#'})
+    assert_equal(
+        '\n\n'.join(layers),
+        dedent('''
+            -----
+            -----
+            -----
+            -----
+            -----
+
+            =====
+            ==#==
+            =###=
+            ==#==
+            =====
+
+            =====
+            =###=
+            =###=
+            =###=
+            =====
+
+            -----
+            --#--
+            -###-
+            --#--
+            -----
+
+            -----
+            -----
+            -----
+            -----
+            -----
+        ''').strip(),
+    )
+
+
+def test_preview():
+    # Refining the mixed blocks ends with the same points as a full render.
+    volume = Difference(Sphere((0, 0, 0), 10), Sphere((5, 5, 5), 10))
+    levels = list(volume.preview(step=8))
+    assert_equal([step for step, points in levels], [8, 4, 2, 1])
+    step, points = levels[-1]
+    assert_equal(set(points), set(volume.render()))
+
+    # Shapes much smaller than the blocks still end up complete.
+    for volume, step in [
+        (Sphere((0, 0, 0), 3), 8),
+        (Union(Sphere((0, 0, 0), 5), Sphere((30, 0, 0), 5)), 16),
+    ]:
+        step, points = list(volume.preview(step))[-1]
+        assert_equal(step, 1)
+        assert_equal(set(points), set(volume.render()))
+
+
+def test_connected_components():
+    # Cutting a sphere with a thick plate leaves a floating cap.
+    sphere = Sphere((0, 0, 0), 4)
+    plate = Box([(-5, 5), (-5, 5), (1, 2)])
+    cut = Difference(sphere, plate)
+    result = connected_components(cut)
+
+    points = set(cut.render())
+    cap = [p for p in points if p.z > 2]
+    assert_equal(result.sizes.tolist(), [0, len(points) - len(cap), len(cap)])
+    assert_equal(result.floating, [2])
+    # The whole bottom of the cap overhangs the cut.
+    assert_equal(
+        int(result.unsupported[:, :, 3 - (-4)].sum()),
+        len([p for p in cap if p.z == 3]),
+    )
+
+    labels, layer_sizes = layer_components(cut)
+    assert_equal(layer_sizes[1 - (-4)], [])
+    assert_equal(layer_sizes[3 - (-4)], [len([p for p in cap if p.z == 3])])
+
+
+def test_parametric_vectorized():
+    # The same path as test_parametric_changing_radius, with array functions.
+    @vectorized
+    def line(t):
+        return (lerp(0.5, 19.5, t), 0, 0)
+
+    @vectorized
+    def radius_func(t):
+        return np.where(t < 0.5, lerp(0, 3.5, t), lerp(3.5, 0, t))
+
+    expected = dedent('''
+        --------###--------
+        -----#########-----
+        --------###--------
+
+        -----#########-----
+        ###################
+        -----#########-----
+
+        --------###--------
+        -----#########-----
+        --------###--------
+    ''').strip()
+
+    for optimizer in ['brent', 'golden', 'grid']:
+        path = Path(line, radius_func, tmin=0, tmax=1, optimizer=optimizer)
+        layers = draw_layers(path.render(), on='#', off='-')
+        assert_equal('\n\n'.join(layers), expected)
+
+
+def test_extrude():
+    calls = []
+
+    def triangle():
+        calls.append(1)
+        return polygon([(0, 0), (0, 2.3), (2.7, 0)])
+
+    prism = Extrude(triangle, (0, 3))
+    points = set(prism.render())
+    assert_equal(len(calls), 1)
+    assert_equal(prism.bounds(), Box([(0, 2), (0, 2), (0, 3)]))
+    assert_equal(
+        points,
+        set(Point3(x, y, z) for z in range(4) for x, y in triangle()),
+    )
+    assert_equal(
+        [prism.contains(p) for p in [(2, 0, 3), (2, 2, 1), (0, 0, 4)]],
+        [True, False, False],
+    )
+    assert_equal(set(Union(prism).render()), points)
+
+
+def test_revolve():
+    # A cone, which shares cross-sections between pairs of layers.
+    cone = Revolve(lambda z: 3 - z // 2, (1.5, 1.5), (0, 5))
+    layers = draw_layers(cone.render(), on='#', off='-')
+    assert_equal(
+        '\n\n'.join(layers),
+        dedent('''
+            -####-
+            ######
+            ######
+            ######
+            ######
+            -####-
+
+            -####-
+            ######
+            ######
+            ######
+            ######
+            -####-
+
+            ------
+            --##--
+            -####-
+            -####-
+            --##--
+            ------
+
+            ------
+            --##--
+            -####-
+            -####-
+            --##--
+            ------
+
+            ------
+            ------
+            --##--
+            --##--
+            ------
+            ------
+
+            ------
+            ------
+            --##--
+            --##--
+            ------
+            ------
+        ''').strip(),
+    )
+    assert_equal(len(cone._sections), 3)
+    assert_equal(
+        set(p for p in cone.render() if p.z == 2),
+        set(Point3(x, y, 2) for x, y in circle((1.5, 1.5), 2)),
+    )
+
+
+def test_symmetric_render():
+    # Symmetric rendering tests a fraction of the points, and must find the
+    # same points as testing all of them, for whole and half integer centers.
+    for center in [(0, 0, 0), (0.5, 0.5, 0.5), (1, 0.5, -2), (0.3, 0, 0)]:
+        for radius in [1, 2.5, 3, 4.7]:
+            sphere = Sphere(center, radius)
+            expected = set(
+                p for p in sphere.bounds().render()
+                if sphere.contains(p)
+            )
+            points = list(sphere.render())
+            assert_equal(len(points), len(expected))
+            assert_equal(set(points), expected)
+
+    # Translating carries the symmetry along only by whole grid steps.
+    for offset in [(0.7, 0.7, 0.7), (2, -1, 3), (0.5, 0, 0)]:
+        moved = Translate(Sphere((0, 0.3, 0.3), 3.3), offset)
+        expected = set(
+            p for p in moved.bounds().render()
+            if moved.contains(p)
+        )
+        assert_equal(set(moved.render()), expected)
+
+    # A pinwheel has quarter and half turn symmetry about the z axis, but no
+    # mirrors across x or y.
+    class Pinwheel(Volume):
+        def __init__(self, center, order):
+            self.center = center
+            self.order = order
+
+        def contains(self, p):
+            cx, cy, cz = self.center
+            u, v = p.x - cx, p.y - cy
+            return (
+                u * v * (u * u - v * v) > 0 and
+                u * u + v * v <= 30 and
+                abs(p.z - cz) <= 1
+            )
+
+        def bounds(self):
+            cx, cy, cz = self.center
+            return Box([
+                (cx - 6, cx + 6),
+                (cy - 6, cy + 6),
+                (cz - 1, cz + 1),
+            ]).to_integers()
+
+        def symmetry(self):
+            return Symmetry(self.center, mirrors=(2,), rotation=self.order)
+
+    for center in [(0, 0, 0), (0.5, 0.5, 0), (0.5, 0, 0), (1, 0, 0.5)]:
+        for order in [2, 4]:
+            pinwheel = Pinwheel(center, order)
+            expected = set(
+                p for p in pinwheel.bounds().render()
+                if pinwheel.contains(p)
+            )
+            points = list(pinwheel.render())
+            assert_equal(len(points), len(expected))
+            assert_equal(set(points), expected)
+
+
+def test_voxel_set():
+    a = Sphere((0, 0, 0), 4)
+    b = Sphere((2, 2, 2), 4)
+    set_a = set(a.render())
+    set_b = set(b.render())
+    voxels_a = VoxelSet.from_volume(a)
+    voxels_b = VoxelSet.from_points(set_b)
+
+    assert_equal(set(voxels_a), set_a)
+    assert_equal(set(voxels_a | voxels_b), set_a | set_b)
+    assert_equal(set(voxels_a & voxels_b), set_a & set_b)
+    assert_equal(set(voxels_a - voxels_b), set_a - set_b)
+    assert_equal(
+        draw_layers(voxels_a - voxels_b),
+        draw_layers(set_a - set_b),
+    )
+    assert_equal(
+        [(z, len(layer)) for z, layer in voxels_a.layers()],
+        [(z, len([p for p in set_a if p.z == z])) for z in range(-3, 4)],
+    )
+    assert_equal(
+        set(voxels_a.layer(-3)),
+        set(p for p in set_a if p.z == -3),
+    )
+    assert_equal(((0, 0, 3) in voxels_a, (0, 0, 4) in voxels_a), (True, False))
+    assert_equal((0, 0, 2**21) in voxels_a, False)
+    assert_equal((0.5, 0, 0) in voxels_a, False)
+    assert_raises(ValueError, VoxelSet.from_points, [(0.5, 0, 0)])
+    assert_equal(VoxelSet().bounds(), None)
@@ -1,10 +1,12 @@
+import itertools
 import math
 from collections import namedtuple
 
-from scipy.optimize import minimize_scalar
+import numpy as np
 
 import vec
-from shape_template import format_points
+from optimizers import get_optimizer
+from shape_template import circle, format_points, ring
 
 #TODO: Match minecraft-style stairs and half-slabs as well as possible when
 # rendering.
@@ -13,11 +15,39 @@ from shape_template import format_points
 
 Point3 = namedtuple('Point', 'x, y, z')
 
+# The mirrors are the axes whose planes through the center reflect the
+# volume onto itself, and the rotation is the order of its rotational symmetry
+# around the vertical line through the center.
+Symmetry = namedtuple('Symmetry', 'center, mirrors, rotation')
+
 
 def dist(a, b):
     return vec.mag(vec.vfrom(a, b))
 
 
+def distances(a, b):
+    """
+    Distances between corresponding points in two arrays of points.
+    """
+    d = b - a
+    return np.sqrt(
+        d[..., 0] * d[..., 0] + d[..., 1] * d[..., 1] + d[..., 2] * d[..., 2]
+    )
+
+
+def vectorized(func):
+    """
+    Mark a Path position or radius function as taking an array of t values.
+
+    A vectorized position function returns a tuple of x, y, and z arrays,
+    and a vectorized radius function returns an array of radii. Components
+    which do not depend on t may be plain numbers. Unmarked functions are
+    called once for each t value.
+    """
+    func.vectorized = True
+    return func
+
+
 def lerp(a, b, t):
     """
     Linear interpolation between two values.
@@ -32,13 +62,265 @@ def lerp(a, b, t):
     return a + (b - a) * t
 
 
+def upsample(grid, factor, shape):
+    """
+    Repeat each cell of a 3D grid factor times along every axis, and crop the
+    result to the given shape.
+    """
+    for axis in range(3):
+        grid = np.repeat(grid, factor, axis=axis)
+    return grid[:shape[0], :shape[1], :shape[2]]
+
+
+def dilate(grid):
+    """
+    Grow the true cells of a 3D boolean grid into all 26 of their neighbors.
+    """
+    padded = np.pad(grid, 1)
+    result = np.zeros_like(grid)
+    nx, ny, nz = grid.shape
+    for dx, dy, dz in itertools.product(range(3), repeat=3):
+        result |= padded[dx:dx + nx, dy:dy + ny, dz:dz + nz]
+    return result
+
+
+def on_half_grid(c):
+    """
+    Whether a coordinate lies on a grid line or halfway between two, so that
+    reflecting about it maps grid points onto grid points.
+    """
+    return float(2 * c).is_integer()
+
+
+def lattice_rotation(center, order):
+    """
+    The largest order of rotation about the vertical line through the center
+    which maps grid points onto grid points, and divides the given order.
+    """
+    cx, cy = center[:2]
+    quarter_turns = (
+        float(cx + cy).is_integer() and
+        float(cx - cy).is_integer()
+    )
+    if order % 4 == 0 and quarter_turns:
+        return 4
+    if order % 2 == 0 and on_half_grid(cx) and on_half_grid(cy):
+        return 2
+    return 1
+
+
+def render_symmetric(volume, symmetry):
+    """
+    Render a volume by testing only a fundamental region of its bounding box,
+    and filling in the rest by reflection and rotation.
+
+    Yield the points as (N, 3) integer arrays, one for each x slab of the
+    fundamental region along with its images. Only the symmetries which map
+    grid points onto grid points are used, so the result is the same set of
+    points as testing every point, though in a different order.
+    """
+    center = np.array(symmetry.center, dtype=float)
+    mirrors = [a for a in symmetry.mirrors if on_half_grid(center[a])]
+    rotation = 1
+    if 0 not in mirrors and 1 not in mirrors:
+        rotation = lattice_rotation(center, symmetry.rotation)
+
+    # Cut the bounding box down to the fundamental region along each mirror,
+    # and to the quadrant or half used by the rotation.
+    box = volume.bounds()
+    limits = [list(b) for b in box._bounds]
+    for axis in mirrors:
+        limits[axis][0] = max(limits[axis][0], math.ceil(center[axis]))
+    if rotation > 1:
+        limits[0][0] = max(limits[0][0], math.floor(center[0]))
+    if rotation == 4:
+        limits[1][0] = max(limits[1][0], math.floor(center[1]))
+
+    doubled = np.round(2 * center).astype(int)
+    for slab in Box(limits).slabs():
+        if rotation > 1:
+            u = slab[:, 0] - center[0]
+            v = slab[:, 1] - center[1]
+            if rotation == 4:
+                keep = ((u > 0) & (v >= 0)) | ((u == 0) & (v == 0))
+            else:
+                keep = (u > 0) | ((u == 0) & (v >= 0))
+            slab = slab[keep]
+        points = slab[volume.contains_array(slab)]
+
+        for axis in mirrors:
+            image = points.copy()
+            image[:, axis] = doubled[axis] - image[:, axis]
+            moved = image[:, axis] != points[:, axis]
+            points = np.concatenate([points, image[moved]])
+
+        if rotation > 1:
+            # Rotate by a quarter or half turn around the center, skipping the
+            # center itself, which maps to itself.
+            u = 2 * points[:, 0] - doubled[0]
+            v = 2 * points[:, 1] - doubled[1]
+            moved = (u != 0) | (v != 0)
+            images = [points]
+            for k in range(1, rotation):
+                for turn in range(4 // rotation):
+                    u, v = -v, u
+                image = points[moved].copy()
+                image[:, 0] = (doubled[0] + u[moved]) // 2
+                image[:, 1] = (doubled[1] + v[moved]) // 2
+                images.append(image)
+            points = np.concatenate(images)
+
+        yield points
+
+
 ## Types of volumes ##
 
 class Volume:
+    def contains_array(self, points):
+        """
+        Test an (N, 3) array of points at once, returning a boolean array.
+
+        Subclasses override this with a vectorized version; the default falls
+        back to calling contains() on each point.
+        """
+        return np.fromiter(
+            (self.contains(Point3(*p)) for p in points.tolist()),
+            dtype=bool,
+            count=len(points),
+        )
+
+    def symmetry(self):
+        """
+        Describe the symmetries of the volume with a Symmetry, or return None
+        if it has none to exploit.
+        """
+        return None
+
+    def render_blocks(self):
+        """
+        Yield the points inside the volume as (N, 3) integer arrays, one x
+        slab of the bounding box at a time.
+        """
+        symmetry = self.symmetry()
+        if symmetry is not None:
+            yield from render_symmetric(self, symmetry)
+            return
+        for slab in self.bounds().slabs():
+            yield slab[self.contains_array(slab)]
+
     def render(self):
-        for p in self.bounds().render():
-            if self.contains(p):
-                yield p
+        for points in self.render_blocks():
+            for x, y, z in points.tolist():
+                yield Point3(x, y, z)
+
+    def render_array(self):
+        """
+        Render the volume as an (N, 3) integer array of points.
+        """
+        return np.concatenate(
+            [np.empty((0, 3), dtype=int)] + list(self.render_blocks())
+        )
+
+    def layer_masks(self):
+        """
+        Yield (z, mask) for each z layer of the bounding box in turn, where
+        mask is a boolean array indexed by [x - xlo, y - ylo].
+        """
+        box = self.bounds()
+        if not all(box.shape()):
+            return
+        x, y = np.mgrid[box.xlo:box.xhi + 1, box.ylo:box.yhi + 1]
+        shape = x.shape
+        x = x.ravel()
+        points = np.column_stack([x, y.ravel(), np.zeros_like(x)])
+        for z in range(box.zlo, box.zhi + 1):
+            points[:, 2] = z
+            yield z, self.contains_array(points).reshape(shape)
+
+    def preview(self, step=8):
+        """
+        Render the volume progressively, for a quick look at large shapes.
+
+        The bounding box is split into blocks step points wide, and each block
+        is tested at its corners, edge midpoints, face centers and center.
+        Blocks whose samples disagree are split in half and tested again.
+        After each level, yield the step and the points of the blocks which
+        are mostly inside.
+
+        A feature which misses every sample of a block, like a thin spike,
+        can be missing from the coarse levels. The last level, at step 1,
+        tests every point not sampled yet, so it is the same as render().
+        """
+        if step < 1 or step & (step - 1):
+            raise ValueError('step must be a power of two')
+        box = self.bounds()
+        shape = np.array(box.shape())
+        lo = np.array([box.xlo, box.ylo, box.zlo])
+
+        known = np.full(tuple(shape), -1, dtype=np.int8)
+        filled = None
+        while step > 1:
+            blocks = tuple(-(-shape // step))
+            if filled is None:
+                filled = np.zeros(blocks, dtype=bool)
+                active = np.ones(blocks, dtype=bool)
+            else:
+                filled = upsample(filled, 2, blocks)
+                active = upsample(mixed, 2, blocks)
+
+            # Test the corners, edges, faces and center of each active block.
+            # Blocks at the far edges are cut short by the box, so place the
+            # samples within the part of each block that is inside the box.
+            origins = np.argwhere(active) * step
+            last = np.minimum(origins + step, shape) - 1
+            fractions = np.array(
+                list(itertools.product((0, 1, 2), repeat=3))
+            )
+            corners = (
+                2 * origins[:, None, :] +
+                (last - origins)[:, None, :] * fractions
+            ) // 2
+            corners = tuple(corners.reshape(-1, 3).T)
+            # Neighboring blocks and finer levels share samples, so only
+            # evaluate each point once.
+            flat = np.ravel_multi_index(corners, known.shape)
+            unknown = np.unique(flat[known.ravel()[flat] < 0])
+            unknown = np.column_stack(np.unravel_index(unknown, known.shape))
+            known[tuple(unknown.T)] = self.contains_array(unknown + lo)
+            values = known[corners].reshape(len(origins), len(fractions)) == 1
+
+            index = tuple((origins // step).T)
+            filled[index] = values.mean(axis=1) >= 0.5
+            mixed = np.zeros(blocks, dtype=bool)
+            mixed[index] = (values != values[:, :1]).any(axis=1)
+            # A surface can pass through a block between its corners, but it
+            # must then also cross a neighboring block, so refine those too.
+            mixed = dilate(mixed) & active
+
+            points = np.argwhere(upsample(filled, step, shape)) + lo
+            yield step, [Point3(x, y, z) for x, y, z in points.tolist()]
+            step //= 2
+
+        # Finish by testing every remaining point, one x slab at a time.
+        for i, slab in enumerate(box.slabs()):
+            unknown = known[i] < 0
+            known[i][unknown] = self.contains_array(
+                slab[unknown.ravel()]
+            )
+        points = np.argwhere(known == 1) + lo
+        yield 1, [Point3(x, y, z) for x, y, z in points.tolist()]
+
+    def occupancy(self, box=None):
+        """
+        Rasterize the volume into a dense boolean array over an integer box,
+        by default its bounds, indexed by [x - xlo, y - ylo, z - zlo].
+        """
+        if box is None:
+            box = self.bounds()
+        grid = np.zeros(box.shape(), dtype=bool)
+        for i, slab in enumerate(box.slabs()):
+            grid[i] = self.contains_array(slab).reshape(grid.shape[1:])
+        return grid
 
 
 class Box(Volume):
@@ -56,13 +338,28 @@ class Box(Volume):
     def contains(self, point):
         p = point
         return (
-            self.xlo < p.x < self.xhi and
-            self.ylo < p.y < self.yhi and
-            self.zlo < p.z < self.zhi
+            self.xlo <= p.x <= self.xhi and
+            self.ylo <= p.y <= self.yhi and
+            self.zlo <= p.z <= self.zhi
+        )
+
+    def contains_array(self, points):
+        x, y, z = points.T
+        return (
+            (self.xlo <= x) & (x <= self.xhi) &
+            (self.ylo <= y) & (y <= self.yhi) &
+            (self.zlo <= z) & (z <= self.zhi)
         )
 
     def bounds(self):
-        return self._bounds
+        return self
+
+    def symmetry(self):
+        return Symmetry(
+            center=tuple((lo + hi) / 2 for lo, hi in self._bounds),
+            mirrors=(0, 1, 2),
+            rotation=1,
+        )
 
     def render(self):
         for x in range(self.xlo, self.xhi + 1):
@@ -70,6 +367,30 @@ class Box(Volume):
                 for z in range(self.zlo, self.zhi + 1):
                     yield Point3(x, y, z)
 
+    def slabs(self):
+        """
+        Yield the integer points of the box as (N, 3) arrays, one x slab at a
+        time, in the same order as render(). An empty box yields nothing.
+        """
+        if not all(self.shape()):
+            return
+        y, z = np.mgrid[self.ylo:self.yhi + 1, self.zlo:self.zhi + 1]
+        y = y.ravel()
+        z = z.ravel()
+        for x in range(self.xlo, self.xhi + 1):
+            yield np.column_stack([np.full_like(y, x), y, z])
+
+    def shape(self):
+        return tuple(
+            max(hi - lo + 1, 0)
+            for lo, hi in self._bounds
+        )
+
+    def occupancy(self, box=None):
+        if box is not None:
+            return super().occupancy(box)
+        return np.ones(self.shape(), dtype=bool)
+
     def to_integers(self):
         integer_bounds = []
         for lo, hi in self._bounds:
@@ -98,6 +419,25 @@ class Box(Volume):
             ),
         ])
 
+    def intersection(self, other):
+        """
+        Get the box that both boxes overlap. It may be empty, with lo > hi.
+        """
+        return Box([
+            (
+                max(self.xlo, other.xlo),
+                min(self.xhi, other.xhi),
+            ),
+            (
+                max(self.ylo, other.ylo),
+                min(self.yhi, other.yhi),
+            ),
+            (
+                max(self.zlo, other.zlo),
+                min(self.zhi, other.zhi),
+            ),
+        ])
+
     def __eq__(self, other):
         return self._bounds == other._bounds
 
@@ -131,6 +471,11 @@ class Plane(Volume):
         )
         return (sign >= 0)
 
+    def contains_array(self, points):
+        d = points - self.center
+        n = self.normal
+        return (d[:, 0] * n[0] + d[:, 1] * n[1] + d[:, 2] * n[2]) >= 0
+
     def bounds(self):
         return self._bounds
 
@@ -144,6 +489,16 @@ class Sphere(Volume):
         point = Point3._make(point)
         return dist(self.center, point) < self.radius
 
+    def contains_array(self, points):
+        d = points - self.center
+        distance = np.sqrt(
+            d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1] + d[:, 2] * d[:, 2]
+        )
+        return distance < self.radius
+
+    def symmetry(self):
+        return Symmetry(center=self.center, mirrors=(0, 1, 2), rotation=1)
+
     def bounds(self):
         c = self.center
         r = self.radius
@@ -199,46 +554,123 @@ class Polyhedron(Volume):
 class Path(Volume):
     distance_tolerance = 0.0001
 
-    def __init__(self, position_func, radius_func, tmin, tmax, bounds=None):
+    def __init__(
+        self,
+        position_func,
+        radius_func,
+        tmin,
+        tmax,
+        bounds=None,
+        optimizer='brent',
+    ):
         # Takes a parametric path function in t for the position and radius.
+        # The optimizer is an Optimizer instance or the name of one, and is
+        # only looked up when the path is first evaluated.
         self.position_func = position_func
         self.radius_func = radius_func
         self.tmin = tmin
         self.tmax = tmax
         self._bounds = bounds
+        self.optimizer = optimizer
+        self._optimizer = None
 
-    def minimize(self, func):
+    def positions(self, ts):
+        """
+        Evaluate the position function at an array of t values, returning
+        an array of points with a trailing axis of length 3.
+        """
+        ts = np.asarray(ts, dtype=float)
+        if getattr(self.position_func, 'vectorized', False):
+            return np.stack(
+                [np.broadcast_to(c, ts.shape) for c in self.position_func(ts)],
+                axis=-1,
+            ).astype(float)
+        return np.array(
+            [self.position_func(t) for t in ts.ravel().tolist()],
+            dtype=float,
+        ).reshape(ts.shape + (3,))
+
+    def radii(self, ts):
+        """
+        Evaluate the radius function at an array of t values.
+        """
+        ts = np.asarray(ts, dtype=float)
+        if getattr(self.radius_func, 'vectorized', False):
+            return np.broadcast_to(self.radius_func(ts), ts.shape)
+        return np.array(
+            [self.radius_func(t) for t in ts.ravel().tolist()],
+            dtype=float,
+        ).reshape(ts.shape)
+
+    def get_optimizer(self):
+        if self._optimizer is None:
+            self._optimizer = get_optimizer(self.optimizer)
+        return self._optimizer
+
+    def minimize(self, func, vectorized=False):
         """
         Return the t value at which the given function is minimized.
         """
-        res = minimize_scalar(
+        return self.get_optimizer().minimize(
             func,
-            bounds=(self.tmin, self.tmax),
-            method='bounded',
+            self.tmin,
+            self.tmax,
+            vectorized=vectorized,
         )
-        return res.x
 
-    def maximize(self, func):
+    def maximize(self, func, vectorized=False):
         """
         Return the t value at which the given function is maximized.
         """
         def neg_func(t):
             return -func(t)
-        return self.minimize(neg_func)
+        return self.minimize(neg_func, vectorized=vectorized)
+
+    def distance_func(self, point):
+        """
+        Make a function of a single t value, giving the distance from the
+        point to the path.
+        """
+        if getattr(self.position_func, 'vectorized', False):
+            def position_func(t):
+                return self.positions(np.array([t]))[0]
+        else:
+            position_func = self.position_func
 
-    def contains(self, point):
-        # Find the nearest spot on the path to the given point.
-            # Write a function for the distance.
-            # Minimize this function over the t domain.
-        # Determine the radius value at the nearest spot, and compare it
-        # with the distance from the path to the point.
         def dist_func(t):
-            curve_point = self.position_func(t)
-            return dist(curve_point, point)
+            return dist(position_func(t), point)
+        return dist_func
+
+    def contains(self, point):
+        return bool(self.contains_array(np.array([point], dtype=float))[0])
+
+    def contains_array(self, points):
+        # Find the nearest spot on the path to each point, by minimizing the
+        # distance over the t domain for all of the points together.
+        # Then compare the radius at the nearest spot with the distance from
+        # the path to the point.
+        points = np.asarray(points, dtype=float)
+        optimizer = self.get_optimizer()
 
-        t_closest = self.minimize(dist_func)
-        distance = dist_func(t_closest)
-        radius = self.radius_func(t_closest)
+        if optimizer.batched:
+            def dist_func(ts, index):
+                return distances(self.positions(ts), points[index])
+
+            t_closest = optimizer.minimize_many(
+                dist_func,
+                self.tmin,
+                self.tmax,
+                len(points),
+            )
+        else:
+            # Sequential optimizers evaluate one t value at a time, which is
+            # quickest with plain calls to the path functions.
+            t_closest = np.array([
+                self.minimize(self.distance_func(point))
+                for point in points.tolist()
+            ], dtype=float)
+        distance = distances(self.positions(t_closest), points)
+        radius = self.radii(t_closest)
 
         return (radius - distance) > self.distance_tolerance
 
@@ -248,28 +680,383 @@ class Path(Volume):
         else:
             # Calculate bounds by doing max/min on a parameterization.
             # We take the radius ball, and trace it along the path, and
-            # doing vec.add(point, (radius, 0, 0)), to find, for example, the
+            # add the radius to a coordinate to find, for example, the
             # +x part of the bounding box.
-            def find_bound(max_or_min, component_func):
-                def f(t):
-                    curve_point = Point3(*self.position_func(t))
-                    radius = self.radius_func(t)
-                    return component_func(curve_point, radius)
-                optimum_t = max_or_min(f)
-                return f(optimum_t)
-
-            xmin = find_bound(self.minimize, lambda p, r: p.x - r)
-            xmax = find_bound(self.maximize, lambda p, r: p.x + r)
-            ymin = find_bound(self.minimize, lambda p, r: p.y - r)
-            ymax = find_bound(self.maximize, lambda p, r: p.y + r)
-            zmin = find_bound(self.minimize, lambda p, r: p.z - r)
-            zmax = find_bound(self.maximize, lambda p, r: p.z + r)
+            def find_bound(max_or_min, axis, sign):
+                def f(ts):
+                    return (
+                        self.positions(ts)[..., axis] +
+                        sign * self.radii(ts)
+                    )
+                optimum_t = max_or_min(f, vectorized=True)
+                return float(f(np.array([optimum_t]))[0])
+
+            xmin = find_bound(self.minimize, 0, -1)
+            xmax = find_bound(self.maximize, 0, +1)
+            ymin = find_bound(self.minimize, 1, -1)
+            ymax = find_bound(self.maximize, 1, +1)
+            zmin = find_bound(self.minimize, 2, -1)
+            zmax = find_bound(self.maximize, 2, +1)
 
             return Box(
                 [(xmin, xmax), (ymin, ymax), (zmin, zmax)]
             ).to_integers()
 
 
+## Constructive solid geometry ##
+
+class Union(Volume):
+    def __init__(self, *volumes):
+        self.volumes = volumes
+
+    def contains(self, point):
+        return any(v.contains(point) for v in self.volumes)
+
+    def contains_array(self, points):
+        result = self.volumes[0].contains_array(points)
+        for v in self.volumes[1:]:
+            result |= v.contains_array(points)
+        return result
+
+    def bounds(self):
+        return Box.from_volumes(list(self.volumes))
+
+
+class Intersection(Volume):
+    def __init__(self, *volumes):
+        self.volumes = volumes
+
+    def contains(self, point):
+        return all(v.contains(point) for v in self.volumes)
+
+    def contains_array(self, points):
+        result = self.volumes[0].contains_array(points)
+        for v in self.volumes[1:]:
+            result &= v.contains_array(points)
+        return result
+
+    def bounds(self):
+        box = self.volumes[0].bounds()
+        for v in self.volumes[1:]:
+            box = box.intersection(v.bounds())
+        return box
+
+
+class Difference(Volume):
+    """
+    The first volume, with all of the following volumes cut away from it.
+    """
+    def __init__(self, volume, *others):
+        self.volume = volume
+        self.others = others
+
+    def contains(self, point):
+        return (
+            self.volume.contains(point) and
+            not any(v.contains(point) for v in self.others)
+        )
+
+    def contains_array(self, points):
+        result = self.volume.contains_array(points)
+        for v in self.others:
+            result &= ~v.contains_array(points)
+        return result
+
+    def bounds(self):
+        return self.volume.bounds()
+
+
+## Transforms ##
+
+class Transform(Volume):
+    """
+    Wrap a volume in an affine transform, which maps each point p of the
+    inner volume to (matrix * p + offset).
+
+    Containment is tested by mapping whole batches of points back through the
+    inverse transform into the inner volume's space.
+    """
+    def __init__(self, volume, matrix, offset=(0, 0, 0)):
+        self.volume = volume
+        self.matrix = np.array(matrix, dtype=float)
+        self.offset = np.array(offset, dtype=float)
+        self.inverse = np.linalg.inv(self.matrix)
+
+    def contains(self, point):
+        return bool(self.contains_array(np.array([point], dtype=float))[0])
+
+    def contains_array(self, points):
+        return self.volume.contains_array(
+            (points - self.offset) @ self.inverse.T
+        )
+
+    def bounds(self):
+        # The transformed corners of the inner bounding box surround the
+        # transformed volume, because affine maps preserve convex hulls.
+        corners = np.array(
+            list(itertools.product(*self.volume.bounds()._bounds)),
+            dtype=float,
+        )
+        corners = corners @ self.matrix.T + self.offset
+        return Box(list(zip(
+            corners.min(axis=0).tolist(),
+            corners.max(axis=0).tolist(),
+        ))).to_integers()
+
+
+class Translate(Transform):
+    def __init__(self, volume, offset):
+        super().__init__(volume, np.identity(3), offset)
+
+    def contains_array(self, points):
+        return self.volume.contains_array(points - self.offset)
+
+    def symmetry(self):
+        # Only an integer offset moves the grid onto itself, so that the
+        # inner volume's symmetries still map grid points onto grid points.
+        inner = self.volume.symmetry()
+        if inner is None or not all(
+            float(c).is_integer() for c in self.offset
+        ):
+            return None
+        return inner._replace(
+            center=tuple(np.add(inner.center, self.offset).tolist()),
+        )
+
+
+class Rotate(Transform):
+    """
+    Rotate a volume by an angle in degrees around an axis vector passing
+    through the given center point.
+    """
+    def __init__(self, volume, axis, angle, center=(0, 0, 0)):
+        axis = np.array(axis, dtype=float)
+        x, y, z = axis / np.linalg.norm(axis)
+        theta = math.radians(angle)
+        c = math.cos(theta)
+        s = math.sin(theta)
+        t = 1 - c
+        matrix = np.array([
+            [t*x*x + c, t*x*y - s*z, t*x*z + s*y],
+            [t*x*y + s*z, t*y*y + c, t*y*z - s*x],
+            [t*x*z - s*y, t*y*z + s*x, t*z*z + c],
+        ])
+        # Snap the entries of axis-aligned quarter turns to exact values, so
+        # that rotated lattice points land back on the lattice.
+        for exact in (-1, 0, 1):
+            matrix[np.isclose(matrix, exact, rtol=0, atol=1e-12)] = exact
+        center = np.array(center, dtype=float)
+        super().__init__(volume, matrix, center - matrix @ center)
+
+
+class Scale(Transform):
+    """
+    Scale a volume about the given center point, by a single factor or by one
+    factor per axis.
+    """
+    def __init__(self, volume, factor, center=(0, 0, 0)):
+        factor = np.broadcast_to(np.array(factor, dtype=float), (3,))
+        matrix = np.diag(factor)
+        center = np.array(center, dtype=float)
+        super().__init__(volume, matrix, center - matrix @ center)
+
+
+class Instances(Volume):
+    """
+    Copies of one volume, placed at each of a list of offsets.
+
+    The prototype volume is rasterized once, and its occupancy is stamped at
+    every integer offset. Copies at non-integer offsets do not line up with
+    the grid, so they fall back to evaluating a translated prototype.
+    """
+    def __init__(self, volume, offsets):
+        self.volume = volume
+        self.offsets = [tuple(o) for o in offsets]
+        self.copies = [Translate(volume, o) for o in self.offsets]
+        self._occupancy = None
+        self._corner = None
+
+    def _is_stamped(self, offset):
+        return all(float(c).is_integer() for c in offset)
+
+    def prototype(self):
+        """
+        Return the cached occupancy grid of the prototype, along with the
+        coordinates of its lowest corner.
+        """
+        if self._occupancy is None:
+            # Bounds given by hand, as for a Path or Plane, may not be
+            # integers. Finding the bounds can be slow, as for a Path, so
+            # only do it once.
+            box = self.volume.bounds().to_integers()
+            self._occupancy = self.volume.occupancy(box)
+            self._corner = np.array([box.xlo, box.ylo, box.zlo])
+        return self._occupancy, self._corner
+
+    def contains(self, point):
+        return bool(self.contains_array(np.array([point], dtype=float))[0])
+
+    def contains_array(self, points):
+        result = np.zeros(len(points), dtype=bool)
+        on_grid = np.all(points == np.round(points), axis=1)
+        for offset, copy in zip(self.offsets, self.copies):
+            if not self._is_stamped(offset):
+                result |= copy.contains_array(points)
+                continue
+            grid, lo = self.prototype()
+            # Look up lattice points in the stamp, and evaluate any points
+            # between lattice points directly.
+            local = np.round(points - offset).astype(int) - lo
+            inside = on_grid & np.all(
+                (local >= 0) & (local < grid.shape),
+                axis=1,
+            )
+            i, j, k = local[inside].T
+            result[inside] |= grid[i, j, k]
+            if not on_grid.all():
+                off_grid = ~on_grid
+                result[off_grid] |= copy.contains_array(points[off_grid])
+        return result
+
+    def bounds(self):
+        return Box.from_volumes(self.copies)
+
+    def render(self):
+        blocks = [np.empty((0, 3), dtype=int)]
+        stamp = None
+        for offset, copy in zip(self.offsets, self.copies):
+            if self._is_stamped(offset):
+                if stamp is None:
+                    grid, lo = self.prototype()
+                    stamp = np.argwhere(grid) + lo
+                blocks.append(stamp + np.array(offset, dtype=int))
+            else:
+                blocks.append(
+                    np.array(list(copy.render()), dtype=int).reshape(-1, 3)
+                )
+        points = np.unique(np.concatenate(blocks), axis=0)
+        for x, y, z in points.tolist():
+            yield Point3(x, y, z)
+
+
+## Extruded volumes ##
+
+class Extrude(Volume):
+    """
+    Stack 2D cross-sections into a volume, one for each integer z in the
+    inclusive zrange.
+
+    The cross-section of each layer is a set of (x, y) points, from calling
+    shape2d with the parameters per_layer_params(z) gives for that layer, as
+    a tuple or a single value. Without per_layer_params, shape2d is called
+    with no arguments, for a straight extrusion. Layers with the same
+    parameters share one rasterized cross-section.
+    """
+    def __init__(self, shape2d, zrange, per_layer_params=None):
+        self.shape2d = shape2d
+        self.zlo, self.zhi = zrange
+        self.per_layer_params = per_layer_params
+        self._sections = {}
+
+    def layer_params(self, z):
+        if self.per_layer_params is None:
+            return ()
+        params = self.per_layer_params(z)
+        if not isinstance(params, tuple):
+            params = (params,)
+        return params
+
+    def section(self, z):
+        """
+        Return the cross-section at z, as a boolean mask indexed by
+        [x - xlo, y - ylo], along with (xlo, ylo).
+        """
+        params = self.layer_params(z)
+        if params not in self._sections:
+            points = self.shape2d(*params)
+            if points:
+                xy = np.array(list(points), dtype=int)
+                lo = xy.min(axis=0)
+                mask = np.zeros(xy.max(axis=0) - lo + 1, dtype=bool)
+                mask[tuple((xy - lo).T)] = True
+            else:
+                lo = np.zeros(2, dtype=int)
+                mask = np.zeros((0, 0), dtype=bool)
+            self._sections[params] = (mask, lo)
+        return self._sections[params]
+
+    def contains(self, point):
+        return bool(self.contains_array(np.array([point], dtype=float))[0])
+
+    def contains_array(self, points):
+        result = np.zeros(len(points), dtype=bool)
+        on_grid = np.all(points == np.round(points), axis=1)
+        z = points[:, 2]
+        layers = on_grid & (self.zlo <= z) & (z <= self.zhi)
+        for layer_z in np.unique(z[layers]).tolist():
+            rows = np.flatnonzero(layers & (z == layer_z))
+            mask, lo = self.section(int(layer_z))
+            local = np.round(points[rows, :2]).astype(int) - lo
+            inside = np.all((local >= 0) & (local < mask.shape), axis=1)
+            rows = rows[inside]
+            result[rows] = mask[tuple(local[inside].T)]
+        return result
+
+    def bounds(self):
+        sections = [
+            self.section(z)
+            for z in range(self.zlo, self.zhi + 1)
+        ]
+        sections = [(mask, lo) for mask, lo in sections if mask.size]
+        if not sections:
+            return Box([(0, 0), (0, 0), (self.zlo, self.zhi)])
+        xy_lo = np.min([lo for mask, lo in sections], axis=0)
+        xy_hi = np.max(
+            [lo + mask.shape - 1 for mask, lo in sections],
+            axis=0,
+        )
+        return Box([
+            (int(xy_lo[0]), int(xy_hi[0])),
+            (int(xy_lo[1]), int(xy_hi[1])),
+            (self.zlo, self.zhi),
+        ])
+
+    def layer_masks(self):
+        box = self.bounds()
+        for z in range(box.zlo, box.zhi + 1):
+            layer = np.zeros(box.shape()[:2], dtype=bool)
+            mask, lo = self.section(z)
+            x, y = lo - (box.xlo, box.ylo)
+            layer[x:x + mask.shape[0], y:y + mask.shape[1]] = mask
+            yield z, layer
+
+    def render(self):
+        # Each layer comes out in turn, ready for draw_layers().
+        for z in range(self.zlo, self.zhi + 1):
+            mask, lo = self.section(z)
+            for x, y in (np.argwhere(mask) + lo).tolist():
+                yield Point3(x, y, z)
+
+
+class Revolve(Extrude):
+    """
+    Revolve a profile around the vertical axis through the point center.
+
+    The profile gives the radius of the layer at each z, or an
+    (outer, inner) pair of radii for a hollow layer. Cross-sections are
+    rasterized with circle() and ring().
+    """
+    def __init__(self, profile, center, zrange):
+        self.center = center
+
+        def shape2d(outer, inner=None):
+            if inner is None:
+                return circle(center, outer)
+            return ring(center, outer, inner)
+
+        super().__init__(shape2d, zrange, profile)
+
+
 ## Drawing logic ##
 
 def translate(points, offset):